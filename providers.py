@@ -0,0 +1,1091 @@
+import os
+import re
+import math
+import time
+import atexit
+import hashlib
+import asyncio
+import functools
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+import diskcache
+import numpy as np
+import orjson
+from aiolimiter import AsyncLimiter
+# The OpenAI library is used for every provider, since DeepSeek maintains
+# compatibility with its API.
+from openai import OpenAI, AsyncOpenAI
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+# uvloop is optional; it only speeds up the event loop used by run().
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# --- Configuration ---
+# Long-lived HTTP connection pools shared by every API call, so the TCP and
+# TLS handshakes are paid once and later requests reuse warm connections.
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60)
+_HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+_http = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+atexit.register(_http.close)
+
+# Async connections are bound to the event loop that opened them, so each
+# running loop gets its own pool and clients, keyed by the loop. run() closes
+# them when its loop finishes; pools of loops closed some other way are
+# dropped the next time a pool is looked up.
+_async_pools = {}
+
+# On-disk cache of translation results, so repeated requests for the same
+# text are answered without calling the API again.
+CACHE_DIR = "./.translate_cache"
+cache = diskcache.Cache(CACHE_DIR)
+
+# Seconds a single API attempt may take before it is aborted and retried.
+# Non-streamed responses only arrive once generation has finished, so
+# requests get an extra second per MIN_TOKENS_PER_SECOND tokens of their
+# max_tokens budget on top of this.
+REQUEST_TIMEOUT = 20.0
+MIN_TOKENS_PER_SECOND = 20
+
+# Transient API failures (rate limits, dropped connections, timeouts and
+# server errors) are retried with jittered exponential backoff, so that
+# concurrent requests do not all retry at the same moment.
+_retry = retry(
+    wait=wait_random_exponential(min=1, max=30),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception_type(
+        (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+    ),
+    reraise=True
+)
+
+# Output length relative to the source, per target language, used to size
+# max_tokens. Languages the tokenizer covers poorly need more tokens for the
+# same content; targets not listed use DEFAULT_EXPANSION.
+LANGUAGE_EXPANSION = {
+    "English": 1.0,
+    "French": 1.3,
+    "Spanish": 1.3,
+    "German": 1.3,
+    "Quechua": 2.0,
+}
+DEFAULT_EXPANSION = 1.5
+MAX_OUTPUT_TOKENS = 512
+
+# Maximum number of requests translate_batch keeps in flight at once.
+MAX_CONCURRENCY = 32
+
+# Number of sentences translate_many packs into a single request.
+MANY_BATCH_SIZE = 8
+
+# The "i. " marker at the start of each line of a translate_many response,
+# matched against the UTF-8 encoded content.
+_NUM_RE = re.compile(rb"^\s*(\d+)\.[ \t]*", re.M)
+
+# Number of requests translate_pool keeps in flight per credential.
+WORKERS_PER_CREDENTIAL = 8
+
+# --- Providers ---
+
+@dataclass(frozen=True)
+class Provider:
+    """
+    An OpenAI-compatible chat completions API and how to prompt it.
+
+    The system prompts are sent verbatim, so every request starts with the
+    same tokens and the provider's prompt prefix cache can be reused across
+    calls. Everything that varies goes in the user prompt templates, which
+    are filled in with str.format and may refer to {text},
+    {source_language} and {target_language}; the templates used by
+    translate_many may also refer to {count} and {numbered}.
+    """
+    name: str
+    base_url: Optional[str]
+    model: str
+    api_key_env: str
+    system_prompt: str
+    user_prompt: str
+    many_system_prompt: str
+    many_user_prompt: str
+    temperature: float
+    # Multiplier on the estimated output length, for prompts that ask for
+    # more than just the translation.
+    max_tokens_factor: int = 1
+    # The most tokens the model generates in one response; translate_many
+    # packs no more lines into a request than fit in it.
+    output_token_limit: int = 4096
+    # Whether results are cached unless the caller says otherwise. Only
+    # sensible for deterministic (temperature 0) providers.
+    use_cache: bool = True
+
+
+PROVIDERS = {
+    # "gpt-3.5-turbo" is a cost-effective and capable model. Temperature 0
+    # gives deterministic, high-quality translations.
+    "openai": Provider(
+        name="OpenAI",
+        base_url=None,
+        model="gpt-3.5-turbo",
+        api_key_env="OPENAI_API_KEY",
+        system_prompt="You are a professional translator.",
+        user_prompt="Translate the following {source_language} text to {target_language}: \"{text}\"",
+        many_system_prompt="You are a professional translator. Translate each numbered line. Output one line per input line, each formatted as `i. <translation>`, and nothing else.",
+        many_user_prompt="Translate the following {count} lines of {source_language} text to {target_language}:\n{numbered}",
+        temperature=0,
+    ),
+    # "deepseek-chat" is a powerful and general model from DeepSeek. It is
+    # also asked to list the spans it was unsure about, which needs room in
+    # max_tokens; it samples at temperature 1.5, so caching is off by default.
+    "deepseek": Provider(
+        name="DeepSeek",
+        base_url="https://api.deepseek.com",
+        model="deepseek-chat",
+        api_key_env="DEEPSEEK_API_KEY",
+        system_prompt="You are an expert translator. Your task is to translate text between the languages given in each message. You must return the translated text, without any conversational filler. After the trasnlation, only indicate a list of the spans in the translated text that you were not sure about, no explanations.",
+        user_prompt="Translate from {source_language} to {target_language}:\n{text}",
+        many_system_prompt="You are an expert translator. Your task is to translate numbered lines between the languages given in each message. You must output one line per input line, each formatted as `i. <translation>`, without any conversational filler.",
+        many_user_prompt="Translate these {count} lines from {source_language} to {target_language}:\n{numbered}",
+        temperature=1.5,
+        max_tokens_factor=2,
+        output_token_limit=8192,
+        use_cache=False,
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Credential:
+    """An API key for a provider and the requests per minute it allows."""
+    provider: Provider
+    api_key: str
+    requests_per_minute: int = 500
+
+
+def _api_key(provider: Provider) -> str:
+    """Reads the provider's API key from the environment. Raises
+    RuntimeError if it is not set."""
+    api_key = os.environ.get(provider.api_key_env)
+    if not api_key:
+        raise RuntimeError(
+            f"{provider.name} API key not found. Please set the {provider.api_key_env} environment variable."
+        )
+    return api_key
+
+
+# Clients are built on first use and shared by every later call.
+@functools.cache
+def get_client(provider: Provider) -> OpenAI:
+    """
+    Returns the synchronous client for `provider`. Raises RuntimeError if its
+    API key is not set. Retries are handled by _create/_acreate below, so
+    the clients' own are off.
+    """
+    return OpenAI(
+        api_key=_api_key(provider),
+        base_url=provider.base_url,
+        http_client=_http,
+        max_retries=0
+    )
+
+
+def _async_pool() -> dict:
+    """
+    Returns the running event loop's async HTTP pool ('http') and its
+    clients by provider ('clients'), creating them on first use.
+    """
+    loop = asyncio.get_running_loop()
+    for closed in [other for other in _async_pools if other.is_closed()]:
+        del _async_pools[closed]
+    if loop not in _async_pools:
+        _async_pools[loop] = {
+            "http": httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT),
+            "clients": {}
+        }
+    return _async_pools[loop]
+
+
+async def _close_async_pool():
+    """Closes the running event loop's async HTTP pool, if it has one."""
+    pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool["http"].aclose()
+
+
+def get_async_client(provider: Provider) -> AsyncOpenAI:
+    """
+    Async variant of get_client, used for batch translation. Must be called
+    from a running event loop; each loop gets its own client.
+    """
+    pool = _async_pool()
+    if provider not in pool["clients"]:
+        pool["clients"][provider] = AsyncOpenAI(
+            api_key=_api_key(provider),
+            base_url=provider.base_url,
+            http_client=pool["http"],
+            max_retries=0
+        )
+    return pool["clients"][provider]
+
+# --- Helpers ---
+
+def _request_timeout(max_tokens: Optional[int]) -> float:
+    """Seconds to allow a non-streamed request that may generate `max_tokens`."""
+    return REQUEST_TIMEOUT + (max_tokens or 0) / MIN_TOKENS_PER_SECOND
+
+
+@_retry
+def _create(client: OpenAI, **kwargs) -> dict:
+    """
+    Calls the chat completions endpoint, retrying transient failures, and
+    returns the response body as plain dicts and lists.
+
+    The raw body is parsed with orjson instead of letting the SDK build its
+    pydantic models, which would validate one object per generated token.
+    """
+    raw = client.chat.completions.with_raw_response.create(
+        timeout=_request_timeout(kwargs.get("max_tokens")), **kwargs
+    )
+    return orjson.loads(raw.content)
+
+
+@_retry
+async def _acreate(aclient: AsyncOpenAI, **kwargs) -> dict:
+    """Async variant of _create."""
+    raw = await aclient.chat.completions.with_raw_response.create(
+        timeout=_request_timeout(kwargs.get("max_tokens")), **kwargs
+    )
+    return orjson.loads(raw.content)
+
+
+@_retry
+def _stream(client: OpenAI, **kwargs):
+    """Opens a streamed chat completion, retrying transient failures."""
+    return client.chat.completions.create(timeout=REQUEST_TIMEOUT, stream=True, **kwargs)
+
+
+def _cache_key(
+    provider: Provider,
+    text_to_translate: str,
+    target_language: str,
+    source_language: str,
+    return_logprobs: bool = True,
+    top_logprobs: int = 0,
+    packed: bool = False
+) -> str:
+    """
+    Hashes everything that determines a translation into a cache key.
+    `packed` keys are for results split out of a translate_many request,
+    which uses the many_* prompts.
+    """
+    if packed:
+        prompts = f"{provider.many_system_prompt}|{provider.many_user_prompt}"
+    else:
+        prompts = f"{provider.system_prompt}|{provider.user_prompt}"
+    key = (
+        f"{provider.model}|{prompts}|"
+        f"{return_logprobs}|{top_logprobs}|"
+        f"{source_language}|{target_language}|{text_to_translate}"
+    )
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _cache_lookup(
+    provider: Provider,
+    text_to_translate: str,
+    target_language: str,
+    source_language: str,
+    use_cache: Optional[bool],
+    return_logprobs: bool = True,
+    top_logprobs: int = 0
+) -> tuple:
+    """
+    Returns the cache key for a single-text request and its cached result,
+    or None for either when there is none. The key is None when caching is
+    off; `use_cache` defaults to the provider's use_cache.
+    """
+    if use_cache is None:
+        use_cache = provider.use_cache
+    if not use_cache:
+        return None, None
+    key = _cache_key(
+        provider, text_to_translate, target_language, source_language, return_logprobs, top_logprobs
+    )
+    return key, cache.get(key)
+
+
+def _cache_store(key: Optional[str], result: dict) -> dict:
+    """Stores `result` under `key`, unless caching is off, and returns it."""
+    if key is not None:
+        cache[key] = result
+    return result
+
+
+async def _map_unique(texts: list, translate) -> list:
+    """
+    Translates each distinct text once and shares the result among its
+    duplicates. `translate` is awaited with the distinct texts, in order of
+    first appearance, and returns one result for each.
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    results = dict(zip(unique_texts, await translate(unique_texts)))
+    return [results[text] for text in texts]
+
+
+def _estimate_out_tokens(text: str, target_language: str) -> int:
+    """
+    Estimates a max_tokens budget for translating `text`, with enough
+    headroom that ordinary translations are never cut short.
+    """
+    # Text in a script written without spaces (Chinese, Japanese, Thai)
+    # splits into a single "word"; count one per few characters instead.
+    words = len(text.split())
+    if words <= 1:
+        words = max(words, len(text) / 3)
+    expansion = LANGUAGE_EXPANSION.get(target_language, DEFAULT_EXPANSION)
+    return min(MAX_OUTPUT_TOKENS, int(words * 3 * expansion) + 16)
+
+
+def _build_request(
+    provider: Provider,
+    text_to_translate: str,
+    target_language: str,
+    source_language: str,
+    return_logprobs: bool = True,
+    top_logprobs: int = 0
+) -> dict:
+    """Builds the keyword arguments for a chat completions call."""
+    fields = dict(
+        text=text_to_translate,
+        source_language=source_language,
+        target_language=target_language
+    )
+
+    # Key parameters:
+    # - model: The provider's chat model.
+    # - messages: The standard format for chat models.
+    # - temperature: The provider's sampling temperature.
+    # - max_tokens: Limits the length of the translation, sized to the input.
+    # - top_p: Set to 1.0.
+    # - logprobs: This is the crucial parameter. Setting it to True tells
+    #             the API to return the log probabilities of the output tokens.
+    # - top_logprobs: The number of alternatives returned for each token. Set
+    #                 explicitly, since alternatives multiply the response size.
+    request = dict(
+        model=provider.model,
+        messages=[
+            {"role": "system", "content": provider.system_prompt},
+            {"role": "user", "content": provider.user_prompt.format(**fields)}
+        ],
+        temperature=provider.temperature,
+        max_tokens=provider.max_tokens_factor * _estimate_out_tokens(text_to_translate, target_language),
+        top_p=1.0
+    )
+    if return_logprobs:
+        request.update(logprobs=True, top_logprobs=top_logprobs)
+    return request
+
+
+def _token_probabilities(logprobs_content: list) -> tuple:
+    """
+    Converts the API's per-token log probabilities into a list of
+    token/probability dictionaries, the probability of the whole sequence
+    and its log probability.
+    """
+    logprobs = np.fromiter(
+        (item["logprob"] for item in logprobs_content),
+        dtype=np.float64,
+        count=len(logprobs_content)
+    )
+
+    # The API returns log probabilities (log(p)). To get the actual
+    # probability (p), we need to calculate e^(log(p)).
+    probabilities = np.exp(logprobs)
+    token_probabilities = [
+        {
+            "token": item["token"],
+            "probability": probability
+        }
+        for item, probability in zip(logprobs_content, probabilities.tolist())
+    ]
+
+    # Alternatives are only present when top_logprobs was requested, and
+    # then for every token, so the first token tells whether to look.
+    if logprobs_content and logprobs_content[0].get("top_logprobs"):
+        for entry, item in zip(token_probabilities, logprobs_content):
+            entry["top_probabilities"] = [
+                {
+                    "token": alternative["token"],
+                    "probability": math.exp(alternative["logprob"])
+                }
+                for alternative in item["top_logprobs"]
+            ]
+
+    # The sequence log probability is the sum of the token log
+    # probabilities. Its exponential, the sequence probability, underflows
+    # to 0.0 for long outputs, which the log probability still tells apart.
+    sequence_logprob = float(logprobs.sum())
+    return token_probabilities, math.exp(sequence_logprob), sequence_logprob
+
+
+def _process_response(response: dict) -> dict:
+    """Extracts the translation and token probabilities from a response."""
+    choice = response["choices"][0]
+    translated_text = choice["message"]["content"].strip()
+    if choice.get("logprobs") is None:
+        token_probabilities, sequence_probability, sequence_logprob = [], None, None
+    else:
+        token_probabilities, sequence_probability, sequence_logprob = _token_probabilities(
+            choice["logprobs"]["content"]
+        )
+
+    return {
+        "translation_text": translated_text,
+        "token_probabilities": token_probabilities,
+        "sequence_probability": sequence_probability,
+        "sequence_logprob": sequence_logprob
+    }
+
+
+def _many_budget(text: str, target_language: str) -> int:
+    """Returns the max_tokens share of one line of a translate_many request,
+    with a few extra tokens for its "i. " marker."""
+    return _estimate_out_tokens(text, target_language) + 4
+
+
+def _pack_chunks(
+    provider: Provider,
+    texts: list,
+    target_language: str,
+    batch_size: int
+) -> list:
+    """
+    Groups the indices of `texts` into translate_many chunks of at most
+    `batch_size` lines whose combined max_tokens budget stays within the
+    provider's output_token_limit.
+    """
+    chunks = []
+    chunk, budget = [], 0
+    for index, text in enumerate(texts):
+        tokens = _many_budget(text, target_language)
+        if chunk and (len(chunk) == batch_size or budget + tokens > provider.output_token_limit):
+            chunks.append(chunk)
+            chunk, budget = [], 0
+        chunk.append(index)
+        budget += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _build_many_request(
+    provider: Provider,
+    texts: list,
+    target_language: str,
+    source_language: str
+) -> dict:
+    """Builds the keyword arguments for a chat completions call that
+    translates several numbered sentences at once."""
+    fields = dict(
+        count=len(texts),
+        numbered="\n".join(f"{i + 1}. {text}" for i, text in enumerate(texts)),
+        source_language=source_language,
+        target_language=target_language
+    )
+    return dict(
+        model=provider.model,
+        messages=[
+            {"role": "system", "content": provider.many_system_prompt},
+            {"role": "user", "content": provider.many_user_prompt.format(**fields)}
+        ],
+        temperature=provider.temperature,
+        max_tokens=min(
+            provider.output_token_limit,
+            sum(_many_budget(text, target_language) for text in texts)
+        ),
+        top_p=1.0,
+        logprobs=True,
+        top_logprobs=0
+    )
+
+
+def _split_many_response(response: dict, count: int) -> list:
+    """
+    Splits a numbered multi-sentence response into one result per sentence.
+
+    Each token is assigned to the sentence whose translation it overlaps, so
+    the numbering markers themselves are left out. Offsets are computed in
+    UTF-8 bytes because a token may hold only part of a multi-byte character.
+    Returns None if the response does not number exactly `count` lines or
+    any of them is empty.
+    """
+    choice = response["choices"][0]
+    content = choice["message"]["content"].encode("utf-8")
+    logprobs_content = choice["logprobs"]["content"]
+
+    markers = list(_NUM_RE.finditer(content))
+    if [int(marker.group(1)) for marker in markers] != list(range(1, count + 1)):
+        return None
+
+    # Byte range [start, end) covered by each token in the content.
+    spans = []
+    position = 0
+    for item in logprobs_content:
+        token_bytes = item.get("bytes")
+        length = len(token_bytes) if token_bytes is not None else len(item["token"].encode("utf-8"))
+        spans.append((position, position + length))
+        position += length
+
+    results = []
+    for index, marker in enumerate(markers):
+        text_end = markers[index + 1].start() if index + 1 < len(markers) else len(content)
+        translation = content[marker.end():text_end].rstrip()
+        if not translation:
+            return None
+        text_start, text_end = marker.end(), marker.end() + len(translation)
+
+        token_probabilities, sequence_probability, sequence_logprob = _token_probabilities([
+            item
+            for item, (start, end) in zip(logprobs_content, spans)
+            if start < text_end and end > text_start
+        ])
+        results.append({
+            "translation_text": translation.decode("utf-8", errors="replace"),
+            "token_probabilities": token_probabilities,
+            "sequence_probability": sequence_probability,
+            "sequence_logprob": sequence_logprob
+        })
+
+    return results
+
+# --- Core Functions ---
+
+def translate_and_get_probs(
+    provider: Provider,
+    text_to_translate: str,
+    target_language: str = "French",
+    source_language: str = "English",
+    use_cache: Optional[bool] = None,
+    return_logprobs: bool = True,
+    top_logprobs: int = 0
+) -> dict:
+    """
+    Translates a given text using the provider's LLM and returns the
+    translation along with the probability of each generated token.
+
+    Args:
+        provider: The API to translate with, e.g. PROVIDERS["openai"].
+        text_to_translate: The string of text to be translated.
+        target_language: The language to translate the text into.
+        source_language: The original language of the text.
+        use_cache: Whether to reuse a result stored in the on-disk cache for
+                   the same input. Defaults to the provider's use_cache.
+        return_logprobs: Whether to request token probabilities at all. Turn
+                         off when only the translation is needed.
+        top_logprobs: The number of most likely alternatives to return for
+                      each token, for callers that need them for alignment.
+
+    Returns:
+        A dictionary containing:
+        - 'translation_text': The translated string.
+        - 'token_probabilities': A list of dictionaries, where each dictionary
+                                 contains a 'token' and its 'probability',
+                                 plus 'top_probabilities' (a list of the same
+                                 shape) when top_logprobs is above 0. Empty
+                                 when return_logprobs is False.
+        - 'sequence_probability': The probability of the whole translation,
+                                  i.e. the product of the token probabilities.
+                                  None when return_logprobs is False.
+        - 'sequence_logprob': The natural log of 'sequence_probability', which
+                              stays usable for long translations whose
+                              probability underflows to 0.0. None when
+                              return_logprobs is False.
+        Returns None if the API call fails.
+
+    Raises:
+        RuntimeError: If the provider's API key is not set.
+    """
+    key, cached = _cache_lookup(
+        provider, text_to_translate, target_language, source_language, use_cache, return_logprobs, top_logprobs
+    )
+    if cached is not None:
+        return cached
+
+    client = get_client(provider)
+
+    try:
+        response = _create(
+            client,
+            **_build_request(
+                provider, text_to_translate, target_language, source_language, return_logprobs, top_logprobs
+            )
+        )
+        result = _process_response(response)
+
+    except Exception as e:
+        print(f"An error occurred during the API call: {e}")
+        return None
+
+    return _cache_store(key, result)
+
+
+async def atranslate_and_get_probs(
+    provider: Provider,
+    text_to_translate: str,
+    target_language: str = "French",
+    source_language: str = "English",
+    use_cache: Optional[bool] = None,
+    return_logprobs: bool = True,
+    top_logprobs: int = 0,
+    aclient: Optional[AsyncOpenAI] = None
+) -> dict:
+    """
+    Async variant of translate_and_get_probs.
+
+    Takes the same arguments and returns the same dictionary (or None if the
+    API call fails), but does not block the event loop while waiting on the
+    API, so many translations can run concurrently. `aclient` sends the
+    request with a specific client instead of the provider's shared one.
+    """
+    key, cached = _cache_lookup(
+        provider, text_to_translate, target_language, source_language, use_cache, return_logprobs, top_logprobs
+    )
+    if cached is not None:
+        return cached
+
+    if aclient is None:
+        aclient = get_async_client(provider)
+
+    try:
+        response = await _acreate(
+            aclient,
+            **_build_request(
+                provider, text_to_translate, target_language, source_language, return_logprobs, top_logprobs
+            )
+        )
+        result = _process_response(response)
+
+    except Exception as e:
+        print(f"An error occurred during the API call: {e}")
+        return None
+
+    return _cache_store(key, result)
+
+
+def itranslate_and_get_probs(
+    provider: Provider,
+    text_to_translate: str,
+    target_language: str = "French",
+    source_language: str = "English"
+):
+    """
+    Streams a translation, yielding each generated token with its
+    probability as soon as it arrives instead of waiting for the whole
+    completion.
+
+    Takes the same arguments as translate_and_get_probs, minus the cache.
+    Yields dictionaries with a 'token' and its 'probability', in generation
+    order. Raises the API error if the call fails, even partway through the
+    stream, so a cut-off translation is never mistaken for a complete one.
+    """
+    client = get_client(provider)
+
+    with _stream(
+        client,
+        **_build_request(provider, text_to_translate, target_language, source_language)
+    ) as stream:
+        for chunk in stream:
+            if not chunk.choices or chunk.choices[0].logprobs is None:
+                continue
+            for item in chunk.choices[0].logprobs.content or ():
+                yield {
+                    "token": item.token,
+                    "probability": math.exp(item.logprob)
+                }
+
+
+async def translate_batch(
+    provider: Provider,
+    texts: list,
+    target_language: str = "French",
+    source_language: str = "English",
+    max_concurrency: int = MAX_CONCURRENCY,
+    use_cache: Optional[bool] = None,
+    return_logprobs: bool = True,
+    top_logprobs: int = 0
+) -> list:
+    """
+    Translates several texts concurrently.
+
+    Args:
+        provider: The API to translate with, e.g. PROVIDERS["openai"].
+        texts: The strings of text to be translated.
+        target_language: The language to translate the texts into.
+        source_language: The original language of the texts.
+        max_concurrency: The maximum number of API calls in flight at once.
+        use_cache: Whether to reuse and store results in the on-disk cache.
+                   Defaults to the provider's use_cache.
+        return_logprobs: Whether to request token probabilities at all.
+        top_logprobs: The number of alternatives to return for each token.
+
+    Returns:
+        A list with one translate_and_get_probs result per input text, in the
+        same order as `texts`. Failed translations are None.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _translate(text):
+        async with semaphore:
+            return await atranslate_and_get_probs(
+                provider, text, target_language, source_language, use_cache, return_logprobs, top_logprobs
+            )
+
+    async def _translate_all(unique_texts):
+        return await asyncio.gather(*(_translate(text) for text in unique_texts))
+
+    return await _map_unique(texts, _translate_all)
+
+
+async def _atranslate_chunk(
+    provider: Provider,
+    texts: list,
+    target_language: str,
+    source_language: str
+) -> list:
+    """Translates `texts` in a single numbered request. Returns None if the
+    call fails or the response cannot be split back into sentences."""
+    aclient = get_async_client(provider)
+
+    try:
+        response = await _acreate(
+            aclient,
+            **_build_many_request(provider, texts, target_language, source_language)
+        )
+        return _split_many_response(response, len(texts))
+
+    except Exception as e:
+        print(f"An error occurred during the API call: {e}")
+        return None
+
+
+async def translate_many(
+    provider: Provider,
+    texts: list,
+    target_language: str = "French",
+    source_language: str = "English",
+    batch_size: int = MANY_BATCH_SIZE,
+    max_concurrency: int = MAX_CONCURRENCY,
+    use_cache: Optional[bool] = None
+) -> list:
+    """
+    Translates several texts, packing up to `batch_size` of them into each
+    request as numbered lines. Fewer are packed when their translations
+    might not fit in the provider's output_token_limit.
+
+    This spends far fewer requests than translate_batch, which matters when
+    the provider's requests-per-minute limit is the bottleneck. A chunk whose
+    response cannot be split back into exactly one line per input is retried
+    with one request per text.
+
+    Args:
+        provider: The API to translate with, e.g. PROVIDERS["openai"].
+        texts: The strings of text to be translated.
+        target_language: The language to translate the texts into.
+        source_language: The original language of the texts.
+        batch_size: The number of texts sent in a single request.
+        max_concurrency: The maximum number of API calls in flight at once.
+        use_cache: Whether to reuse and store results in the on-disk cache.
+                   Defaults to the provider's use_cache.
+
+    Returns:
+        A list with one translate_and_get_probs result per input text, in the
+        same order as `texts`. Failed translations are None.
+    """
+    if use_cache is None:
+        use_cache = provider.use_cache
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _translate_one(text):
+        async with semaphore:
+            return await atranslate_and_get_probs(provider, text, target_language, source_language, use_cache)
+
+    async def _translate(chunk):
+        # Returns the results and whether they came from a packed request.
+        async with semaphore:
+            results = await _atranslate_chunk(provider, chunk, target_language, source_language)
+        if results is not None:
+            return results, True
+        # The fallback requests are ordinary single-text ones, cached as
+        # such, and each takes its own slot.
+        results = await asyncio.gather(*(_translate_one(text) for text in chunk))
+        return results, False
+
+    async def _translate_all(unique_texts):
+        # Only texts without a cached result are sent to the API. Results of
+        # earlier single-text requests are reused as well as packed ones.
+        keys = [None] * len(unique_texts)
+        results = [None] * len(unique_texts)
+        if use_cache:
+            keys = [_cache_key(provider, text, target_language, source_language, packed=True) for text in unique_texts]
+            results = [
+                cache.get(key) or _cache_lookup(provider, text, target_language, source_language, use_cache)[1]
+                for key, text in zip(keys, unique_texts)
+            ]
+        pending = [index for index, result in enumerate(results) if result is None]
+
+        chunks = [
+            [pending[i] for i in chunk]
+            for chunk in _pack_chunks(provider, [unique_texts[index] for index in pending], target_language, batch_size)
+        ]
+        chunk_results = await asyncio.gather(
+            *(_translate([unique_texts[index] for index in chunk]) for chunk in chunks)
+        )
+        for chunk, (translated, packed) in zip(chunks, chunk_results):
+            for index, result in zip(chunk, translated):
+                results[index] = _cache_store(keys[index], result) if packed else result
+        return results
+
+    return await _map_unique(texts, _translate_all)
+
+
+async def translate_pool(
+    credentials: list,
+    texts: list,
+    target_language: str = "French",
+    source_language: str = "English",
+    workers_per_credential: int = WORKERS_PER_CREDENTIAL,
+    use_cache: Optional[bool] = None
+) -> list:
+    """
+    Translates several texts concurrently, spreading the requests over
+    several API keys and providers.
+
+    Each credential gets its own client and workers, throttled to its
+    requests_per_minute, and the workers all take texts from a shared queue,
+    so a credential with spare capacity picks up work the others cannot.
+    Together the credentials allow the sum of their rate limits. A text
+    whose translation fails is handed to a credential that has not tried it
+    yet, so each credential tries each text at most once.
+
+    Args:
+        credentials: Credential objects to translate with.
+        texts: The strings of text to be translated.
+        target_language: The language to translate the texts into.
+        source_language: The original language of the texts.
+        workers_per_credential: The number of API calls each credential
+                                keeps in flight at once.
+        use_cache: Whether to reuse and store results in the on-disk cache.
+                   Defaults to each provider's use_cache.
+
+    Returns:
+        A list with one translate_and_get_probs result per input text, in the
+        same order as `texts`. Failed translations are None.
+    """
+    async def _translate_all(unique_texts):
+        results = dict.fromkeys(unique_texts)
+        remaining = len(unique_texts)
+        done = asyncio.Event()
+        if not remaining:
+            done.set()
+
+        # Every text starts in the shared queue, which is never refilled. A
+        # text that fails goes to the retry queue of a credential that has
+        # not tried it yet, the least busy one, so each credential tries each
+        # text at most once.
+        fresh = asyncio.Queue()
+        for text in unique_texts:
+            fresh.put_nowait(text)
+        retries = [asyncio.Queue() for _ in credentials]
+        tried = {text: set() for text in unique_texts}
+
+        def _finish(text, result):
+            nonlocal remaining
+            results[text] = result
+            remaining -= 1
+            if not remaining:
+                done.set()
+
+        async def _worker(index, credential, aclient, limiter):
+            while True:
+                if not retries[index].empty():
+                    text = retries[index].get_nowait()
+                elif not fresh.empty():
+                    text = fresh.get_nowait()
+                else:
+                    # Only retries can still arrive.
+                    text = await retries[index].get()
+                tried[text].add(index)
+
+                # Cache hits don't count against the rate limit.
+                key, result = _cache_lookup(credential.provider, text, target_language, source_language, use_cache)
+                if result is None:
+                    async with limiter:
+                        result = await atranslate_and_get_probs(
+                            credential.provider, text, target_language, source_language, False, aclient=aclient
+                        )
+                    if result is not None:
+                        _cache_store(key, result)
+
+                untried = [other for other in range(len(credentials)) if other not in tried[text]]
+                if result is None and untried:
+                    retries[min(untried, key=lambda other: retries[other].qsize())].put_nowait(text)
+                else:
+                    _finish(text, result)
+
+        workers = []
+        for index, credential in enumerate(credentials):
+            aclient = AsyncOpenAI(
+                api_key=credential.api_key,
+                base_url=credential.provider.base_url,
+                http_client=_async_pool()["http"],
+                max_retries=0
+            )
+            limiter = AsyncLimiter(credential.requests_per_minute, 60)
+            workers.extend(
+                asyncio.create_task(_worker(index, credential, aclient, limiter))
+                for _ in range(workers_per_credential)
+            )
+        if workers:
+            await done.wait()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        return [results[text] for text in unique_texts]
+
+    return await _map_unique(texts, _translate_all)
+
+
+def run(coroutine):
+    """
+    Runs a batch coroutine, e.g. translate_batch(...), to completion from
+    synchronous code and returns its result.
+
+    Uses uvloop's event loop when it is installed, which handles the socket
+    events of many concurrent requests with less overhead than asyncio's
+    default loop. The loop's async HTTP pool is closed before returning.
+    """
+    async def _main():
+        try:
+            return await coroutine
+        finally:
+            await _close_async_pool()
+
+    if uvloop is None:
+        return asyncio.run(_main())
+    return uvloop.run(_main())
+
+# --- Batch API ---
+# For large offline jobs the Batch API is cheaper than the chat completions
+# endpoint and has its own rate limits, in exchange for results that arrive
+# within hours rather than seconds.
+
+# Seconds collect_batch waits between status checks.
+BATCH_POLL_INTERVAL = 30.0
+
+# Batch statuses after which the batch will not change any more.
+_BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def submit_batch(
+    provider: Provider,
+    texts: list,
+    target_language: str = "French",
+    source_language: str = "English"
+) -> str:
+    """
+    Submits the translation of `texts` as a single Batch API job.
+
+    Args:
+        provider: The API to translate with, e.g. PROVIDERS["openai"].
+        texts: The strings of text to be translated.
+        target_language: The language to translate the texts into.
+        source_language: The original language of the texts.
+
+    Returns:
+        The batch id to pass to collect_batch, or None if the submission
+        fails.
+    """
+    client = get_client(provider)
+
+    # One request per line; the custom_id records the text's position.
+    lines = b"\n".join(
+        orjson.dumps({
+            "custom_id": f"s{index}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _build_request(provider, text, target_language, source_language)
+        })
+        for index, text in enumerate(texts)
+    )
+
+    try:
+        batch_file = _retry(client.files.create)(file=("batch.jsonl", lines), purpose="batch")
+        batch = _retry(client.batches.create)(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    except Exception as e:
+        print(f"An error occurred during the API call: {e}")
+        return None
+
+
+def collect_batch(
+    provider: Provider,
+    batch_id: str,
+    poll_interval: float = BATCH_POLL_INTERVAL
+) -> list:
+    """
+    Waits for a batch submitted with submit_batch to finish and returns its
+    translations.
+
+    Args:
+        provider: The API the batch was submitted to.
+        batch_id: The id returned by submit_batch.
+        poll_interval: Seconds to wait between status checks.
+
+    Returns:
+        A list with one translate_and_get_probs result per submitted text, in
+        submission order. Requests that failed are None. Returns None if the
+        batch itself failed, expired or was cancelled.
+    """
+    client = get_client(provider)
+
+    try:
+        batch = _retry(client.batches.retrieve)(batch_id)
+        while batch.status not in _BATCH_FINAL_STATUSES:
+            time.sleep(poll_interval)
+            batch = _retry(client.batches.retrieve)(batch_id)
+
+        if batch.status != "completed":
+            print(f"Batch {batch_id} finished with status '{batch.status}'.")
+            return None
+
+        results = [None] * batch.request_counts.total
+        if batch.output_file_id is None:
+            return results
+        output = _retry(client.files.content)(batch.output_file_id).content
+
+    except Exception as e:
+        print(f"An error occurred during the API call: {e}")
+        return None
+
+    # Output lines are not in submission order, so the custom_id is used to
+    # put each result back in place.
+    for line in output.splitlines():
+        if not line:
+            continue
+        record = orjson.loads(line)
+        response = record.get("response")
+        if response is None or response["status_code"] != 200:
+            continue
+        results[int(record["custom_id"][1:])] = _process_response(response["body"])
+
+    return results